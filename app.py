@@ -1,9 +1,30 @@
-from flask import Flask, redirect, request, render_template, session, url_for, jsonify, send_from_directory
+from flask import Flask, Response, redirect, request, render_template, session, url_for, jsonify, send_from_directory, g, has_app_context
+from html.parser import HTMLParser
+from urllib.parse import quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+import click
+import cProfile
+import gzip
+import io
+import json
+import pstats
+import random
+import re
+import sys
+import threading
+import zipfile
 import requests
 import os
 import time
+from collections import Counter, deque
 import mysql.connector 
 from dotenv import load_dotenv
+from PIL import Image, ImageOps
+
+try:
+    import brotli
+except ImportError:  # Optional: without it we only offer gzip
+    brotli = None
 
 # Load sensitive info from .env file
 load_dotenv()
@@ -22,7 +43,191 @@ DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 APPEALS_WEBHOOK_URL = os.getenv("APPEALS_WEBHOOK_URL") 
 
 REDIRECT_URI = os.getenv("REDIRECT_URI")
-API_ENDPOINT = 'https://discord.com/api/v10'
+SITE_URL = (os.getenv("SITE_URL") or "https://majikku.org").rstrip("/")
+API_ENDPOINT = (os.getenv("DISCORD_API_URL") or 'https://discord.com/api/v10').rstrip("/")
+
+# --- RESPONSE COMPRESSION ---
+# gunicorn serves directly with no proxy in front, so dynamic HTML/JSON is compressed here.
+# Levels are tuned for latency (fast brotli/gzip settings), not maximum ratio.
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/xml', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'}
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Per gunicorn worker and reset on restart; `flask measure-compression` gives repeatable numbers.
+compression_stats = {}  # endpoint -> {"responses", "bytes_in", "bytes_out", "cpu_seconds"}
+
+def compress_body(body, encoding):
+    if encoding == 'br': return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+@app.after_request
+def compress_response(response):
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES: return response
+    response.vary.add('Accept-Encoding')
+
+    # Leave alone anything already encoded, streamed, partial or passed straight from disk.
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers
+            or response.cache_control.no_transform):
+        return response
+
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if not encoding: return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE: return response
+
+    started = time.process_time()
+    compressed = compress_body(body, encoding)
+    cpu = time.process_time() - started
+
+    stats = compression_stats.setdefault(request.endpoint or 'unknown', {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0})
+    stats["responses"] += 1
+    stats["bytes_in"] += len(body)
+    stats["bytes_out"] += len(compressed)
+    stats["cpu_seconds"] += cpu
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag: response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+# --- REQUEST PROFILING ---
+# Opt-in per request: an admin adds `X-Profile: 1` or `?_profile=1`, or a random
+# PROFILE_SAMPLE_RATE fraction of requests is picked. Each capture stores a cProfile `.prof`
+# plus wall-clock stacks sampled from the request thread in collapsed format (`.folded`),
+# which /admin/profiles renders as a flamegraph. With no trigger the cost is one header
+# lookup per request.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(app.root_path, "data", "profiles")
+PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "50"))
+PROFILE_STACK_INTERVAL = 0.005  # Matches the interpreter's default GIL switch interval
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+    def __init__(self, thread_id):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(PROFILE_STACK_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack: self.stacks[';'.join(reversed(stack))] += 1
+
+@app.before_request
+def start_profiling():
+    if request.endpoint in ('static', 'admin_profiles', 'admin_profile_file', 'admin_profile_flamegraph'): return
+    requested = request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1'
+    if not (requested and session.get('is_admin')) and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+        return
+    # Kept on the request, not `g`: nested requests (e.g. static export renders) can share `g`.
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    profiler = cProfile.Profile()
+    request.profile_capture = (profiler, sampler, time.time())
+    profiler.enable()
+
+@app.teardown_request
+def finish_profiling(error=None):
+    capture = getattr(request, 'profile_capture', None)
+    if capture is None: return
+    profiler, sampler, started = capture
+    profiler.disable()
+    del request.profile_capture
+    sampler.stopped.set()
+    sampler.join()
+    try:
+        save_profile(profiler, sampler.stacks, time.time() - started)
+    except Exception as e:
+        print(f"Profile Save Error: {e}")
+
+def cprofile_stacks(profiler):
+    """Approximates collapsed stacks from cProfile's caller graph, weighted by self time in µs.
+
+    Used when a request finished too quickly for the stack sampler to catch it.
+    """
+    stats = pstats.Stats(profiler).stats
+    stacks = Counter()
+    for func, (_, _, self_time, _, _) in stats.items():
+        weight = int(self_time * 1000000)
+        if not weight: continue
+        path, seen, current = [], set(), func
+        while current is not None and current not in seen:
+            seen.add(current)
+            path.append(f"{current[2]} ({os.path.basename(current[0])}:{current[1]})")
+            callers = stats.get(current, (0, 0, 0, 0, {}))[4]
+            current = max(callers, key=lambda c: callers[c][3], default=None) # Heaviest caller
+        stacks[';'.join(reversed(path))] += weight
+    return stacks
+
+def save_profile(profiler, stacks, duration):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    source = "sampled"
+    if not stacks:
+        stacks, source = cprofile_stacks(profiler), "cprofile"
+    endpoint = re.sub(r'[^A-Za-z0-9_-]', '_', request.endpoint or 'unknown')
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{os.getpid()}-{endpoint}"
+    base = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(f"{base}.prof")
+    with open(f"{base}.folded", 'w') as f:
+        for stack, count in stacks.most_common(): f.write(f"{stack} {count}\n")
+    meta = {"name": name, "method": request.method, "path": request.full_path.rstrip('?'), "endpoint": request.endpoint,
+            "duration_ms": round(duration * 1000, 1), "stack_source": source, "samples": sum(stacks.values()), "created_at": time.strftime('%Y-%m-%d %H:%M:%S')}
+    with open(f"{base}.json", 'w') as f: json.dump(meta, f)
+
+    # Keep only the newest PROFILE_MAX_CAPTURES captures
+    captures = sorted(f[:-5] for f in os.listdir(PROFILE_DIR) if f.endswith('.json'))
+    for old in captures[:-PROFILE_MAX_CAPTURES]:
+        for ext in ('.json', '.prof', '.folded'):
+            try: os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except FileNotFoundError: pass
+
+def render_flamegraph(folded_lines, width=1200, row_height=18):
+    """Renders collapsed stacks ("a;b;c 12") as a standalone SVG flamegraph, root at the bottom."""
+    root = {"name": "all", "value": 0, "children": {}}
+    for line in folded_lines:
+        stack, _, count = line.rstrip().rpartition(' ')
+        if not stack or not count.isdigit(): continue
+        node = root
+        node["value"] += int(count)
+        for frame in stack.split(';'):
+            node = node["children"].setdefault(frame, {"name": frame, "value": 0, "children": {}})
+            node["value"] += int(count)
+
+    def depth(node): return 1 + max((depth(c) for c in node["children"].values()), default=0)
+    height = depth(root) * row_height
+    total = root["value"] or 1
+    rects = []
+
+    def draw(node, x, level):
+        w = node["value"] / total * width
+        if w < 0.5: return
+        y = height - (level + 1) * row_height
+        hue = 10 + sum(map(ord, node["name"])) % 40
+        label = escape(node["name"], {'"': '&quot;'})
+        pct = node["value"] * 100 / total
+        rects.append(
+            f'<g><title>{label} ({node["value"]}, {pct:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="hsl({hue},85%,55%)" rx="2"/>'
+            + (f'<text x="{x + 3:.1f}" y="{y + row_height - 5}" font-size="11" font-family="monospace">{escape(node["name"][:int(w / 7)])}</text>' if w > 35 else '')
+            + '</g>'
+        )
+        child_x = x
+        for child in node["children"].values():
+            draw(child, child_x, level + 1)
+            child_x += child["value"] / total * width
+
+    draw(root, 0, 0)
+    return f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">{"".join(rects)}</svg>'
 
 # --- ROLE IDS (PERMISSIONS) ---
 # 1. ADMINS: Can do everything
@@ -126,15 +331,128 @@ LEGAL_DATA = {
     }
 }
 
+# --- CIRCUIT BREAKERS ---
+# Every call to Discord or MySQL has a timeout and goes through a per-worker breaker. Once
+# too many recent calls fail the breaker opens and calls fail fast with DependencyUnavailable
+# instead of tying up a gunicorn worker; after a cooldown one probe call is let through
+# (half-open) and its result decides whether the breaker closes again.
+DISCORD_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+MYSQL_TIMEOUT = 5
+MYSQL_QUERY_TIMEOUT = 10  # seconds to wait on a single query round-trip (read_timeout/write_timeout)
+
+class DependencyUnavailable(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+    def __init__(self, name):
+        super().__init__(f"{name} is temporarily unavailable")
+        self.name = name
+
+class CircuitBreaker:
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, cooldown=30):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.results = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0
+        self.probing = False
+        self.latency_ms = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "open":
+                if time.time() - self.opened_at < self.cooldown: return False
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.probing: return False
+                self.probing = True
+            return True
+
+    def record(self, ok, latency_ms=None):
+        with self.lock:
+            if latency_ms is not None:
+                self.latency_ms = latency_ms if self.latency_ms is None else round(0.8 * self.latency_ms + 0.2 * latency_ms, 1)
+            if self.state == "half_open":
+                self.probing = False
+                if ok:
+                    self.state = "closed"
+                    self.results.clear()
+                else:
+                    self.trip()
+                return
+            self.results.append(ok)
+            failures = self.results.count(False)
+            if len(self.results) >= self.min_calls and failures / len(self.results) >= self.failure_rate:
+                self.trip()
+
+    def trip(self):
+        if self.state != "open": print(f"⚠️ Circuit breaker '{self.name}' opened.")
+        self.state = "open"
+        self.opened_at = time.time()
+
+    def status(self):
+        failures = self.results.count(False)
+        return {
+            "state": self.state,
+            "failure_rate": round(failures / len(self.results), 2) if self.results else 0,
+            "latency_ms": self.latency_ms,
+            "retry_in": max(0, round(self.cooldown - (time.time() - self.opened_at))) if self.state == "open" else 0
+        }
+
+discord_breaker = CircuitBreaker("discord")
+cdn_breaker = CircuitBreaker("discord_cdn")
+mysql_breaker = CircuitBreaker("mysql")
+BREAKERS = [discord_breaker, cdn_breaker, mysql_breaker]
+
+def breaker_request(breaker, method, url, **kwargs):
+    """requests.request() with a timeout, guarded by a breaker. 5xx responses count as failures."""
+    if not breaker.allow(): raise DependencyUnavailable(breaker.name)
+    kwargs.setdefault('timeout', DISCORD_TIMEOUT)
+    started = time.monotonic()
+    try:
+        r = requests.request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        breaker.record(False, (time.monotonic() - started) * 1000)
+        raise
+    breaker.record(r.status_code < 500, (time.monotonic() - started) * 1000)
+    return r
+
 # --- DATABASE CONNECTION ---
 def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DB"),
-        collation='utf8mb4_general_ci'
-    )
+    if not mysql_breaker.allow(): raise DependencyUnavailable(mysql_breaker.name)
+    started = time.monotonic()
+    try:
+        conn = mysql.connector.connect(
+            host=os.getenv("MYSQL_HOST"),
+            user=os.getenv("MYSQL_USER"),
+            password=os.getenv("MYSQL_PASSWORD"),
+            database=os.getenv("MYSQL_DB"),
+            collation='utf8mb4_general_ci',
+            connection_timeout=MYSQL_TIMEOUT,
+            read_timeout=MYSQL_QUERY_TIMEOUT,
+            write_timeout=MYSQL_QUERY_TIMEOUT
+        )
+    except mysql.connector.Error:
+        mysql_breaker.record(False, (time.monotonic() - started) * 1000)
+        raise
+    mysql_breaker.record(True, (time.monotonic() - started) * 1000)
+    return conn
+
+# Errors that mean MySQL itself is unhealthy (lost connection, query timeout, lock wait timeout)
+# rather than a bad query. connect() is recorded above; these come from the query phase.
+MYSQL_OUTAGE_ERRORS = (
+    mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError,
+    mysql.connector.errors.ReadTimeoutError, mysql.connector.errors.WriteTimeoutError
+)
+MYSQL_LOCK_WAIT_TIMEOUT = 1205
+
+def record_mysql_error(e):
+    """Counts a query-phase error against the MySQL breaker if it points at an outage. Returns True if it did."""
+    if not isinstance(e, MYSQL_OUTAGE_ERRORS) and getattr(e, 'errno', None) != MYSQL_LOCK_WAIT_TIMEOUT: return False
+    mysql_breaker.record(False)
+    return True
 
 # --- INIT DATABASE ---
 def init_mysql_db():
@@ -180,6 +498,50 @@ def init_mysql_db():
                 denial_reason TEXT DEFAULT NULL
             )
         ''')
+
+        # 4. Application Queue (Holds applications while Discord is unavailable)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS application_queue (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_json TEXT NOT NULL,
+                data_json LONGTEXT NOT NULL,
+                thread_id VARCHAR(50) DEFAULT NULL,
+                payloads_json LONGTEXT DEFAULT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                claimed_at TIMESTAMP NULL DEFAULT NULL,
+                failed_at TIMESTAMP NULL DEFAULT NULL,
+                last_error TEXT DEFAULT NULL
+            )
+        ''')
+        for column in ("thread_id VARCHAR(50) DEFAULT NULL", "payloads_json LONGTEXT DEFAULT NULL", "failed_at TIMESTAMP NULL DEFAULT NULL", "last_error TEXT DEFAULT NULL"):
+            try:
+                cursor.execute(f"ALTER TABLE application_queue ADD COLUMN {column}")
+            except mysql.connector.Error as err:
+                if err.errno != 1060: raise # 1060 = column already exists
+
+        # 5. Wiki Link Graph (Forward links; backlinks via the target index)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS wiki_links (
+                source_slug VARCHAR(255) NOT NULL,
+                target_slug VARCHAR(255) NOT NULL,
+                PRIMARY KEY (source_slug, target_slug),
+                INDEX idx_wiki_links_target (target_slug)
+            )
+        ''')
+        try:
+            cursor.execute("CREATE INDEX idx_wiki_category ON wiki (category)")
+        except mysql.connector.Error as err:
+            if err.errno != 1061: raise # 1061 = index already exists
+
+        # 6. Content Versions (Cross-worker cache invalidation)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS content_versions (
+                domain VARCHAR(255) PRIMARY KEY,
+                version INT NOT NULL DEFAULT 1,
+                updated_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+                INDEX idx_content_versions_updated (updated_at)
+            )
+        ''')
         
         conn.commit()
         cursor.close()
@@ -195,8 +557,7 @@ def seed_wiki_db():
         cursor.execute("SELECT count(*) FROM wiki")
         if cursor.fetchone()[0] == 0:
             print("🌱 Seeding Wiki...")
-            for slug, data in INITIAL_WIKI_DATA.items():
-                cursor.execute("INSERT INTO wiki (slug, title, category, content) VALUES (%s, %s, %s, %s)", (slug, data['title'], data['category'], data['content']))
+            cursor.executemany("INSERT INTO wiki (slug, title, category, content) VALUES (%s, %s, %s, %s)", [(slug, data['title'], data['category'], data['content']) for slug, data in INITIAL_WIKI_DATA.items()])
             conn.commit()
         cursor.close()
         conn.close()
@@ -205,6 +566,88 @@ def seed_wiki_db():
 init_mysql_db()
 seed_wiki_db()
 
+# --- CONTENT VERSIONS (Cross-worker cache coherence) ---
+# Every gunicorn worker keeps its own in-process cache. Admin write paths bump a
+# row in `content_versions` per content domain ("announcements:NEWS", "wiki",
+# "wiki:<slug>", "staff"), and each worker polls that table at most once every
+# CONTENT_VERSION_CHECK_MS to drop only the entries that changed.
+CONTENT_VERSION_CHECK_MS = int(os.getenv("CONTENT_VERSION_CHECK_MS", "2000"))
+
+content_cache = {}  # domain -> {"data": ..., "timestamp": ...}
+content_versions = {"seen": {}, "checked_at": 0, "since": None}
+
+def bump_content_version(cursor, *domains):
+    """Marks content domains as changed. Call before conn.commit() in admin write paths."""
+    domains = sorted(set(domains))
+    cursor.executemany(
+        "INSERT INTO content_versions (domain, version) VALUES (%s, 1) ON DUPLICATE KEY UPDATE version = version + 1",
+        [(domain,) for domain in domains]
+    )
+    # This worker sees its own write immediately; the others catch up on their next check.
+    for domain in domains: content_cache.pop(domain, None)
+    if has_app_context():
+        g.setdefault('changed_domains', set()).update(domains)
+
+def sync_content_versions():
+    """Drops cached domains whose version changed in another worker. Runs at most every CONTENT_VERSION_CHECK_MS."""
+    now = time.time() * 1000
+    if now - content_versions["checked_at"] < CONTENT_VERSION_CHECK_MS: return
+    content_versions["checked_at"] = now
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if content_versions["since"] is None:
+            cursor.execute("SELECT domain, version, updated_at FROM content_versions")
+        else:
+            # Small overlap so a write that committed late with an older timestamp is not missed.
+            cursor.execute("SELECT domain, version, updated_at FROM content_versions WHERE updated_at >= %s - INTERVAL 5 SECOND", (content_versions["since"],))
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+    except DependencyUnavailable:
+        return # Keep serving what we have until MySQL is back
+    except Exception as e:
+        if isinstance(e, mysql.connector.Error): record_mysql_error(e)
+        print(f"Content Version Error: {e}")
+        return
+
+    seen = content_versions["seen"]
+    for domain, version, updated_at in rows:
+        if seen.get(domain) != version:
+            seen[domain] = version
+            content_cache.pop(domain, None)
+        if content_versions["since"] is None or updated_at > content_versions["since"]:
+            content_versions["since"] = updated_at
+
+@app.after_request
+def export_changed_content(response):
+    # Runs after the view has committed, so the re-rendered pages see the new content.
+    domains = g.pop('changed_domains', None)
+    if domains: refresh_static_export(*domains)
+    return response
+
+def cached_content(domain, loader, max_age=None):
+    """Returns the cached value for a domain, calling loader() on a miss. None results are not cached.
+
+    If an expired entry can't be refreshed because a dependency is down, the stale value is served.
+    """
+    sync_content_versions()
+    entry = content_cache.get(domain)
+    if entry and (max_age is None or time.time() - entry["timestamp"] < max_age):
+        return entry["data"]
+    try:
+        data = loader()
+    except DependencyUnavailable:
+        if not entry: raise
+        data = None
+    except mysql.connector.Error as e:
+        if not record_mysql_error(e) or not entry: raise
+        data = None
+    if data is None and entry: return entry["data"]
+    if data is not None:
+        content_cache[domain] = {"data": data, "timestamp": time.time()}
+    return data
+
 # --- HELPERS ---
 def get_hytale_profile(discord_id):
     try:
@@ -232,35 +675,101 @@ STAFF_GROUPS = [
     {"name": "Moderation Team", "roles": [{"id": "1207778265008439467", "title": "Senior Moderator"}, {"id": "1207778265931055204", "title": "Moderator"}, {"id": "1207778266572918904", "title": "Helper"}]}
 ]
 
-staff_cache = {"data": None, "timestamp": 0}
-
 def get_staff_data():
-    if time.time() - staff_cache["timestamp"] < 300 and staff_cache["data"]: return staff_cache["data"]
+    # Discord is the source of truth for the roster, so it still expires after 5 minutes;
+    # the "staff" domain lets an admin force every worker to refresh early.
+    return cached_content("staff", load_staff_data, max_age=300) or {}
+
+def load_staff_data():
     headers = {"Authorization": f"Bot {BOT_TOKEN}"}
     try:
-        response = requests.get(f"{API_ENDPOINT}/guilds/{GUILD_ID}/members?limit=1000", headers=headers)
-        if response.status_code != 200: return {}
+        response = breaker_request(discord_breaker, 'GET', f"{API_ENDPOINT}/guilds/{GUILD_ID}/members?limit=1000", headers=headers)
+        if response.status_code != 200: return None
         members = response.json()
         grouped = {group["name"]: [] for group in STAFF_GROUPS}
         for member in members:
             user = member.get("user", {})
             user_roles = member.get("roles", [])
-            avatar = f"https://cdn.discordapp.com/avatars/{user['id']}/{user['avatar']}.png" if user.get("avatar") else "https://cdn.discordapp.com/embed/avatars/0.png"
+            avatar = url_for('avatar_proxy', user_id=user['id'], avatar_hash=user['avatar']) if user.get("avatar") else "https://cdn.discordapp.com/embed/avatars/0.png"
             for group in STAFF_GROUPS:
                 found = None
                 for r in group["roles"]:
                     if r["id"] in user_roles: found = r["title"]; break
-                if found: grouped[group["name"]].append({"name": member.get("nick") or user.get("username"), "avatar": avatar, "role": found})
-        staff_cache["data"] = grouped; staff_cache["timestamp"] = time.time()
+                if found: grouped[group["name"]].append({"name": member.get("nick") or user.get("username"), "avatar": avatar, "role": found, "user_id": user.get("id"), "avatar_hash": user.get("avatar")})
         return grouped
-    except: return {}
+    except: return None
+
+# --- AVATAR PROXY ---
+# Staff avatars are fetched from Discord once per avatar hash (the hash changes whenever the
+# avatar does), shrunk to the size /staff displays and kept on disk as WebP in a size-bounded
+# LRU, so visitors never wait on Discord's CDN for thumbnails.
+AVATAR_CDN_URL = (os.getenv("AVATAR_CDN_URL") or "https://cdn.discordapp.com").rstrip("/")
+AVATAR_CACHE_DIR = os.getenv("AVATAR_CACHE_DIR") or os.path.join(app.root_path, "data", "avatars")
+AVATAR_CACHE_MAX_BYTES = int(os.getenv("AVATAR_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+AVATAR_SIZE = 200  # .staff-img is 100px, doubled for high-DPI screens
+AVATAR_HASH_PATTERN = re.compile(r'^(a_)?[0-9a-f]{32}$')
+
+def fetch_avatar_webp(user_id, avatar_hash):
+    """Downloads an avatar from the CDN and returns it resized as WebP bytes, or None."""
+    try:
+        r = breaker_request(cdn_breaker, 'GET', f"{AVATAR_CDN_URL}/avatars/{user_id}/{avatar_hash}.png?size=256")
+        if r.status_code != 200: return None
+        img = ImageOps.fit(Image.open(io.BytesIO(r.content)).convert("RGBA"), (AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "WEBP", quality=80)
+        return out.getvalue()
+    except Exception as e:
+        print(f"Avatar Fetch Error: {e}")
+        return None
+
+def evict_avatar_cache():
+    """Deletes least recently used avatars until the cache fits in AVATAR_CACHE_MAX_BYTES."""
+    entries = []
+    for entry in os.scandir(AVATAR_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith('.webp'):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= AVATAR_CACHE_MAX_BYTES: break
+        try: os.remove(path)
+        except FileNotFoundError: pass
+        total -= size
+
+def is_staff_avatar(user_id, avatar_hash):
+    """Only avatars on the current roster are proxied, so visitors can't fill the cache or make us fetch arbitrary images."""
+    return any(m.get("user_id") == user_id and m.get("avatar_hash") == avatar_hash
+               for members in get_staff_data().values() for m in members)
+
+@app.route('/avatars/<user_id>/<avatar_hash>.webp')
+def avatar_proxy(user_id, avatar_hash):
+    if not user_id.isdigit() or not AVATAR_HASH_PATTERN.match(avatar_hash): return "Avatar not found", 404
+    if not is_staff_avatar(user_id, avatar_hash): return "Avatar not found", 404
+
+    filename = f"{user_id}_{avatar_hash}.webp"
+    path = os.path.join(AVATAR_CACHE_DIR, filename)
+    if os.path.exists(path):
+        os.utime(path) # Mark as recently used for the LRU
+    else:
+        data = fetch_avatar_webp(user_id, avatar_hash)
+        if data is None: return redirect(f"{AVATAR_CDN_URL}/avatars/{user_id}/{avatar_hash}.png")
+        os.makedirs(AVATAR_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f: f.write(data)
+        os.replace(tmp, path)
+        evict_avatar_cache()
+
+    response = send_from_directory(AVATAR_CACHE_DIR, filename, mimetype='image/webp', max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 # --- PERMISSION CHECKS (The Internal Logic) ---
 def check_role(user_id, role_ids):
     """Checks discord API to see if user has a role ID from the list."""
     headers = {"Authorization": f"Bot {BOT_TOKEN}"}
     try:
-        r = requests.get(f"{API_ENDPOINT}/guilds/{GUILD_ID}/members/{user_id}", headers=headers)
+        r = breaker_request(discord_breaker, 'GET', f"{API_ENDPOINT}/guilds/{GUILD_ID}/members/{user_id}", headers=headers)
         if r.status_code == 200:
             user_roles = r.json().get('roles', [])
             return any(rid in user_roles for rid in role_ids)
@@ -308,7 +817,61 @@ def send_wiki_approval_request(sub_id, title, category, author_name, sub_type, c
     
     url = f"https://discord.com/api/v10/channels/{channel_id}/messages"
     headers = {"Authorization": f"Bot {os.getenv('BOT_TOKEN')}", "Content-Type": "application/json"}
-    requests.post(url, headers=headers, json={"embeds": [embed], "components": components})
+    try:
+        breaker_request(discord_breaker, 'POST', url, headers=headers, json={"embeds": [embed], "components": components})
+    except Exception as e:
+        # The submission is already saved and listed under Pending Approvals in /admin.
+        print(f"Wiki Approval Message Error: {e}")
+
+# --- DISCORD EMBED PACKING ---
+EMBED_FIELD_NAME_LIMIT = 256
+EMBED_FIELD_VALUE_LIMIT = 1024
+EMBED_FIELDS_LIMIT = 25        # Fields per embed
+MESSAGE_EMBEDS_LIMIT = 10      # Embeds per message
+MESSAGE_CHARS_LIMIT = 6000     # Characters across every embed in one message
+
+def truncate_text(text, limit):
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def embed_chars(embed):
+    """Characters of an embed that count towards MESSAGE_CHARS_LIMIT."""
+    return (len(embed.get("title", "")) + len(embed.get("description", ""))
+            + len(embed.get("footer", {}).get("text", "")) + len(embed.get("author", {}).get("name", ""))
+            + sum(len(f["name"]) + len(f["value"]) for f in embed.get("fields", [])))
+
+def pack_embed_messages(fields, color, first_embeds=None):
+    """Packs (name, value) fields, in order, into the fewest webhook payloads Discord accepts.
+
+    Filling each message as far as the limits allow before starting the next one is optimal
+    when the order has to be kept, since every field is far smaller than a whole message.
+    first_embeds (e.g. an application header) lead the first message and count against its
+    limits; the fields start in a new embed after them.
+    """
+    messages = []
+    embeds = list(first_embeds or [])
+    chars = sum(embed_chars(embed) for embed in embeds)
+    new_embed = bool(embeds) # Never append fields to the caller's embeds
+    for name, value in fields:
+        # Discord rejects empty field names and values
+        name = truncate_text(str(name if name is not None else "").strip() or "N/A", EMBED_FIELD_NAME_LIMIT)
+        value = truncate_text(str(value if value is not None else "").strip() or "N/A", EMBED_FIELD_VALUE_LIMIT)
+        size = len(name) + len(value)
+
+        if embeds and chars + size > MESSAGE_CHARS_LIMIT:
+            messages.append({"embeds": embeds})
+            embeds, chars = [], 0
+        if not embeds or new_embed or len(embeds[-1]["fields"]) >= EMBED_FIELDS_LIMIT:
+            if len(embeds) >= MESSAGE_EMBEDS_LIMIT:
+                messages.append({"embeds": embeds})
+                embeds, chars = [], 0
+            embeds.append({"color": color, "fields": []})
+            new_embed = False
+
+        embeds[-1]["fields"].append({"name": name, "value": value, "inline": False})
+        chars += size
+
+    if embeds: messages.append({"embeds": embeds})
+    return messages
 
 # --- LOGIN & SESSIONS ---
 @app.route('/login')
@@ -336,11 +899,11 @@ def callback():
 
     try:
         # 2. Exchange Code for Token
-        token_resp = requests.post(f'{API_ENDPOINT}/oauth2/token', data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        token_resp = breaker_request(discord_breaker, 'POST', f'{API_ENDPOINT}/oauth2/token', data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
         token_resp.raise_for_status() # This raises the error if it fails
         
         # 3. Get User Info
-        user_resp = requests.get(f'{API_ENDPOINT}/users/@me', headers={'Authorization': f'Bearer {token_resp.json().get("access_token")}'})
+        user_resp = breaker_request(discord_breaker, 'GET', f'{API_ENDPOINT}/users/@me', headers={'Authorization': f'Bearer {token_resp.json().get("access_token")}'})
         user_data = user_resp.json()
         
         # 4. Save Session
@@ -361,6 +924,10 @@ def callback():
             print(f"OAuth Code invalid or expired (User likely refreshed): {e}")
             return redirect(url_for('login'))
         return f"Login Error: {e}"
+
+    except (DependencyUnavailable, requests.exceptions.RequestException) as e:
+        print(f"Login unavailable: {e}")
+        return "Login is temporarily unavailable because Discord is not responding. Please try again in a minute.", 503
         
     except Exception as e:
         return f"Internal Login Error: {e}"
@@ -436,6 +1003,7 @@ def admin_post():
     cursor = conn.cursor()
     cursor.execute('INSERT INTO announcements (title, content, category, author) VALUES (%s, %s, %s, %s)', 
                    (request.form['title'], request.form['content'], request.form.get('category'), session['user']['username']))
+    bump_content_version(cursor, f"announcements:{request.form.get('category')}")
     conn.commit()
     cursor.close()
     conn.close()
@@ -448,6 +1016,9 @@ def admin_edit(id):
     cursor = conn.cursor(dictionary=True)
     if request.method == 'POST':
         cursor.execute("UPDATE announcements SET title = %s, content = %s WHERE id = %s", (request.form['title'], request.form['content'], id))
+        cursor.execute("SELECT category FROM announcements WHERE id = %s", (id,))
+        row = cursor.fetchone()
+        if row: bump_content_version(cursor, f"announcements:{row['category']}")
         conn.commit()
         cursor.close()
         conn.close()
@@ -462,14 +1033,200 @@ def admin_edit(id):
 def admin_delete(id):
     if 'user' not in session: return "Unauthorized", 403
     conn = get_db_connection()
-    cursor = conn.cursor()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT category FROM announcements WHERE id = %s", (id,))
+    row = cursor.fetchone()
     cursor.execute('DELETE FROM announcements WHERE id = %s', (id,))
+    if row: bump_content_version(cursor, f"announcements:{row['category']}")
     conn.commit()
     cursor.close()
     conn.close()
     return redirect(url_for('admin'))
 
+@app.route('/admin/staff/refresh')
+def admin_staff_refresh():
+    """Forces every worker to re-fetch the staff roster from Discord."""
+    if 'user' not in session or not session.get('is_admin'): return "Unauthorized", 403
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    bump_content_version(cursor, "staff")
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return redirect(url_for('staff'))
+
+@app.route('/admin/compression')
+def admin_compression():
+    """Bytes saved and CPU spent on compression per route, for this worker since it started."""
+    if 'user' not in session or not session.get('is_admin'): return "Unauthorized", 403
+    report = {}
+    for endpoint, stats in sorted(compression_stats.items()):
+        report[endpoint] = {
+            **stats,
+            "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+            "ratio": round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None,
+            "avg_cpu_ms": round(stats["cpu_seconds"] * 1000 / stats["responses"], 3) if stats["responses"] else None,
+        }
+    return jsonify(report)
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    if 'user' not in session or not session.get('is_admin'): return "Unauthorized", 403
+    captures = []
+    if os.path.isdir(PROFILE_DIR):
+        for f in sorted(os.listdir(PROFILE_DIR), reverse=True):
+            if not f.endswith('.json'): continue
+            try:
+                with open(os.path.join(PROFILE_DIR, f)) as meta: captures.append(json.load(meta))
+            except (OSError, ValueError): pass # Evicted or still being written
+    return render_template('profiles.html', captures=captures, sample_rate=PROFILE_SAMPLE_RATE, user=session.get('user'))
+
+@app.route('/admin/profiles/<name>.<ext>')
+def admin_profile_file(name, ext):
+    if 'user' not in session or not session.get('is_admin'): return "Unauthorized", 403
+    if ext not in ('prof', 'folded'): return "Profile not found", 404
+    return send_from_directory(PROFILE_DIR, f"{name}.{ext}", as_attachment=True)
+
+@app.route('/admin/profiles/<name>/flamegraph.svg')
+def admin_profile_flamegraph(name):
+    if 'user' not in session or not session.get('is_admin'): return "Unauthorized", 403
+    path = os.path.join(PROFILE_DIR, f"{name}.folded")
+    if '/' in name or not os.path.isfile(path): return "Profile not found", 404
+    with open(path) as f: svg = render_flamegraph(f)
+    return Response(svg, mimetype='image/svg+xml')
+
+# --- WIKI LINK GRAPH ---
+# Outgoing /wiki/<slug> links are parsed once when a page is written and stored in
+# `wiki_links`, so backlinks, category neighbours and broken links are plain indexed
+# queries at request time.
+WIKI_LINK_BATCH_SIZE = 500
+WIKI_LINK_PATH = re.compile(r'^/wiki/([^/]+)/?$')
+
+class WikiLinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.slugs = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a': return
+        href = urlsplit((dict(attrs).get('href') or '').strip())
+        if href.netloc and href.netloc != urlsplit(SITE_URL).netloc: return
+        match = WIKI_LINK_PATH.match(href.path)
+        if match: self.slugs.add(unquote(match.group(1)))
+
+def extract_wiki_links(content):
+    parser = WikiLinkParser()
+    parser.feed(content or '')
+    parser.close()
+    return parser.slugs
+
+def reindex_wiki_links(conn, pages, relabeled=None):
+    """Replaces the outgoing links of (slug, content) pages; content None means deleted.
+
+    `relabeled` maps slugs whose title, category or existence changed to their old and new
+    categories. Returns the slugs whose rendered backlinks or category neighbours changed:
+    pages gaining or losing a backlink, plus every linked page and category neighbour of a
+    relabeled page. A content-only edit therefore touches only the links it added or removed.
+    """
+    relabeled = relabeled or {}
+    cursor = conn.cursor()
+    slugs = [slug for slug, _ in pages]
+    old_links = set()
+    for start in range(0, len(slugs), WIKI_LINK_BATCH_SIZE):
+        batch = slugs[start:start + WIKI_LINK_BATCH_SIZE]
+        fmt = ','.join(['%s'] * len(batch))
+        cursor.execute(f"SELECT source_slug, target_slug FROM wiki_links WHERE source_slug IN ({fmt})", tuple(batch))
+        old_links.update((row[0], row[1]) for row in cursor.fetchall())
+        cursor.execute(f"DELETE FROM wiki_links WHERE source_slug IN ({fmt})", tuple(batch))
+
+    links = [(slug, target) for slug, content in pages if content is not None for target in sorted(extract_wiki_links(content) - {slug})]
+    for start in range(0, len(links), WIKI_LINK_BATCH_SIZE):
+        cursor.executemany("INSERT IGNORE INTO wiki_links (source_slug, target_slug) VALUES (%s, %s)", links[start:start + WIKI_LINK_BATCH_SIZE])
+    affected = {target for _, target in old_links.symmetric_difference(links)}
+    affected.update(target for source, target in old_links.union(links) if source in relabeled)
+
+    categories = sorted({c for cats in relabeled.values() for c in cats if c})
+    if categories:
+        cursor.execute(f"SELECT slug FROM wiki WHERE category IN ({','.join(['%s'] * len(categories))})", tuple(categories))
+        affected.update(row[0] for row in cursor.fetchall())
+    cursor.close()
+    return affected
+
+def rebuild_wiki_links():
+    """Re-parses every page, a batch at a time. Returns the number of pages indexed."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    indexed, last = 0, ''
+    while True:
+        cursor.execute("SELECT slug, content FROM wiki WHERE slug > %s ORDER BY slug LIMIT %s", (last, WIKI_LINK_BATCH_SIZE))
+        pages = cursor.fetchall()
+        if not pages: break
+        reindex_wiki_links(conn, pages)
+        conn.commit()
+        indexed += len(pages)
+        last = pages[-1][0]
+    cursor.close()
+    conn.close()
+    return indexed
+
+def get_wiki_listing(cursor, slug):
+    """Returns (title, category) for a live page, or None. These are all neighbour lists show."""
+    cursor.execute("SELECT title, category FROM wiki WHERE slug = %s", (slug,))
+    row = cursor.fetchone()
+    if not row: return None
+    return (row['title'], row['category']) if isinstance(row, dict) else (row[0], row[1])
+
+def wiki_relabels(slug, old, title, category):
+    """The relabeled entry for reindex_wiki_links when a page's listing changed, else {}."""
+    if old == (title, category): return {}
+    return {slug: [old[1] if old else None, category]}
+
+@app.route('/admin/wiki/links')
+def admin_wiki_links():
+    if 'user' not in session: return "Unauthorized", 403
+    if not (session.get('is_admin') or session.get('is_story') or session.get('is_wiki_lead') or session.get('is_wiki_editor')):
+        return "Unauthorized", 403
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('''
+        SELECT l.source_slug, s.title AS source_title, l.target_slug
+        FROM wiki_links l
+        JOIN wiki s ON s.slug = l.source_slug
+        LEFT JOIN wiki t ON t.slug = l.target_slug
+        WHERE t.slug IS NULL
+        ORDER BY l.target_slug, s.title
+    ''')
+    broken = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return render_template('wiki_links.html', broken_links=broken, user=session.get('user'))
+
+@app.cli.command("rebuild-wiki-links")
+def rebuild_wiki_links_command():
+    """Re-parses every wiki page and rebuilds the link index."""
+    click.echo(f"✅ Indexed links for {rebuild_wiki_links()} pages.")
+
+def init_wiki_links():
+    """Builds the link index once for wikis that existed before it did."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM wiki_links)")
+        indexed = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+        if not indexed: rebuild_wiki_links()
+    except Exception as e: print(f"Wiki Link Index Error: {e}")
+
+init_wiki_links()
+
 # --- WIKI EDITING ---
+def normalize_wiki_slug(raw):
+    """Slugs are lowercased with spaces turned into dashes. Returns None for slugs /wiki/<slug> can't serve."""
+    slug = str(raw or '').lower().replace(" ", "-")
+    if not slug or len(slug) > 255 or '/' in slug: return None
+    return slug
+
 @app.route('/admin/wiki/new', methods=['GET', 'POST'])
 def admin_wiki_new():
     if 'user' not in session: return "Unauthorized", 403
@@ -477,7 +1234,8 @@ def admin_wiki_new():
     if not has_access: return "Unauthorized", 403
 
     if request.method == 'POST':
-        slug = request.form['slug'].lower().replace(" ", "-")
+        slug = normalize_wiki_slug(request.form['slug'])
+        if not slug: return "Invalid slug", 400
         title = request.form['title']
         category = request.form['category']
         content = request.form['content']
@@ -491,7 +1249,10 @@ def admin_wiki_new():
         cursor = conn.cursor()
         
         if is_bypass:
+            old = get_wiki_listing(cursor, slug)
             cursor.execute("REPLACE INTO wiki (slug, title, category, content) VALUES (%s, %s, %s, %s)", (slug, title, category, content))
+            affected = reindex_wiki_links(conn, [(slug, content)], wiki_relabels(slug, old, title, category))
+            bump_content_version(cursor, "wiki", f"wiki:{slug}", *(f"wiki:{s}" for s in affected))
             conn.commit()
         else:
             cursor.execute('''INSERT INTO wiki_submissions (slug, title, category, content, author_id, author_name, submission_type) VALUES (%s, %s, %s, %s, %s, %s, 'NEW')''', (slug, title, category, content, user_id, username))
@@ -531,6 +1292,7 @@ def admin_wiki_edit(slug):
         if is_bypass:
             # ADMIN/LEAD ACTION: PUBLISH IMMEDIATELY
             # We use REPLACE INTO to handle both "New" pages and "Edits" to existing ones.
+            old = get_wiki_listing(cursor, slug)
             cursor.execute(
                 "REPLACE INTO wiki (slug, title, category, content) VALUES (%s, %s, %s, %s)", 
                 (slug, title, category, content)
@@ -539,7 +1301,9 @@ def admin_wiki_edit(slug):
             # If this was a review of a pending submission, mark it as APPROVED now.
             if submission_id:
                 cursor.execute("UPDATE wiki_submissions SET status='APPROVED' WHERE id=%s", (submission_id,))
-                
+
+            affected = reindex_wiki_links(conn, [(slug, content)], wiki_relabels(slug, old, title, category))
+            bump_content_version(cursor, "wiki", f"wiki:{slug}", *(f"wiki:{s}" for s in affected))
             conn.commit()
         else:
             # EDITOR ACTION: SUBMIT EDIT REQUEST
@@ -583,12 +1347,333 @@ def admin_wiki_delete(slug):
     
     conn = get_db_connection()
     cursor = conn.cursor()
+    old = get_wiki_listing(cursor, slug)
     cursor.execute("DELETE FROM wiki WHERE slug=%s", (slug,))
+    affected = reindex_wiki_links(conn, [(slug, None)], {slug: [old[1]]} if old else {})
+    bump_content_version(cursor, "wiki", f"wiki:{slug}", *(f"wiki:{s}" for s in affected))
     conn.commit()
     cursor.close()
     conn.close()
     return redirect(url_for('admin'))
 
+# --- WIKI IMPORT / EXPORT ---
+# Archives are either a JSON list of {"slug", "title", "category", "content"} objects
+# (optionally wrapped as {"pages": [...]}) or a ZIP of such JSON files. Export produces
+# the same JSON list, so an export can be imported back as-is.
+WIKI_IMPORT_BATCH_SIZE = 100
+WIKI_IMPORT_MAX_BYTES = 50 * 1024 * 1024
+
+def read_wiki_archive(raw):
+    """Returns the list of page objects in a JSON or ZIP archive."""
+    def pages_from(data):
+        if isinstance(data, dict): data = data.get('pages', [data])
+        if not isinstance(data, list): raise ValueError("Expected a page object or a list of pages.")
+        return data
+
+    if zipfile.is_zipfile(io.BytesIO(raw)):
+        pages = []
+        with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+            members = [m for m in archive.infolist() if m.filename.lower().endswith('.json') and not m.is_dir()]
+            if sum(m.file_size for m in members) > WIKI_IMPORT_MAX_BYTES: raise ValueError("Archive is too large.")
+            for member in sorted(members, key=lambda m: m.filename):
+                pages.extend(pages_from(json.loads(archive.read(member).decode('utf-8'))))
+        return pages
+    return pages_from(json.loads(raw.decode('utf-8')))
+
+def validate_wiki_pages(pages):
+    """Checks slugs and categories without touching the database. Returns (rows, errors).
+
+    Slugs are normalised exactly like admin_wiki_new does, so any exported wiki re-imports as-is.
+    """
+    rows, errors, seen = [], [], set()
+    for i, page in enumerate(pages):
+        if not isinstance(page, dict):
+            errors.append(f"#{i}: not a page object"); continue
+        raw_slug = page.get('slug')
+        slug = normalize_wiki_slug(raw_slug)
+        title = str(page.get('title') or '').strip()
+        category = str(page.get('category') or '').strip()
+        content = page.get('content')
+
+        if not slug: errors.append(f"#{i}: invalid slug '{raw_slug}'")
+        elif slug in seen: errors.append(f"#{i}: duplicate slug '{slug}'")
+        if not title or len(title) > 255: errors.append(f"#{i} ({slug}): title is missing or longer than 255 characters")
+        if not category or len(category) > 255 or any(not part.strip() for part in category.split('>')):
+            errors.append(f"#{i} ({slug}): invalid category '{category}'")
+        if not isinstance(content, str): errors.append(f"#{i} ({slug}): content must be a string")
+
+        seen.add(slug)
+        rows.append((slug, title, category, content))
+    return rows, errors
+
+def import_wiki_pages(rows, dry_run=False):
+    """Writes validated rows in batched REPLACEs inside one transaction. Returns a summary."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT slug, title, category FROM wiki")
+        existing = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        summary = {
+            "pages": len(rows),
+            "new": sorted(r[0] for r in rows if r[0] not in existing),
+            "updated": sorted(r[0] for r in rows if r[0] in existing),
+            "dry_run": dry_run
+        }
+        if not dry_run:
+            for start in range(0, len(rows), WIKI_IMPORT_BATCH_SIZE):
+                cursor.executemany("REPLACE INTO wiki (slug, title, category, content) VALUES (%s, %s, %s, %s)", rows[start:start + WIKI_IMPORT_BATCH_SIZE])
+            relabeled = {}
+            for r in rows: relabeled.update(wiki_relabels(r[0], existing.get(r[0]), r[1], r[2]))
+            affected = reindex_wiki_links(conn, [(r[0], r[3]) for r in rows], relabeled)
+            bump_content_version(cursor, "wiki", *(f"wiki:{r[0]}" for r in rows), *(f"wiki:{s}" for s in affected))
+            conn.commit()
+        return summary
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def iter_wiki_export():
+    """Returns a generator over the whole wiki as a JSON list, reading rows in batches instead of all at once.
+
+    The connection is opened and the query run before this returns, so a database outage raises
+    here rather than after a streamed response has already been sent as a 200.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True) # Unbuffered: rows stream from the server
+    except Exception:
+        conn.close()
+        raise
+
+    def chunks():
+        try:
+            cursor.execute("SELECT slug, title, category, content FROM wiki ORDER BY slug")
+            yield None
+            yield "["
+            first = True
+            while True:
+                rows = cursor.fetchmany(WIKI_IMPORT_BATCH_SIZE)
+                if not rows: break
+                for row in rows:
+                    yield ("" if first else ",") + "\n" + json.dumps(row, ensure_ascii=False)
+                    first = False
+            yield "\n]\n"
+        finally:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass # "Unread result found" when a download is aborted midway; closing the connection drops them
+            finally:
+                conn.close()
+    export = chunks()
+    next(export) # Runs the query; once started, closing the generator early still reaches the finally
+    return export
+
+@app.route('/admin/wiki/import', methods=['POST'])
+def admin_wiki_import():
+    if 'user' not in session: return "Unauthorized", 403
+    if not (session.get('is_admin') or session.get('is_story') or session.get('is_wiki_lead')):
+        return "Unauthorized", 403
+
+    def result(errors=None, summary=None, status=200):
+        return render_template('wiki_import.html', errors=errors, summary=summary, user=session.get('user')), status
+
+    upload = request.files.get('archive')
+    if not upload: return result(["No archive uploaded."], status=400)
+    raw = upload.read(WIKI_IMPORT_MAX_BYTES + 1)
+    if len(raw) > WIKI_IMPORT_MAX_BYTES: return result(["Archive is too large."], status=400)
+    try:
+        pages = read_wiki_archive(raw)
+    except (ValueError, zipfile.BadZipFile) as e:
+        return result([f"Could not read archive: {e}"], status=400)
+
+    rows, errors = validate_wiki_pages(pages)
+    if errors: return result(errors, status=400)
+    return result(summary=import_wiki_pages(rows, dry_run=request.form.get('dry_run') == 'on'))
+
+@app.route('/admin/wiki/export')
+def admin_wiki_export():
+    if 'user' not in session: return "Unauthorized", 403
+    if not (session.get('is_admin') or session.get('is_story') or session.get('is_wiki_lead')):
+        return "Unauthorized", 403
+    # No stream_with_context: the rows don't need the request, and the server closing the
+    # generator directly is what releases the connection on an aborted download.
+    return Response(iter_wiki_export(), mimetype='application/json',
+                    headers={'Content-Disposition': 'attachment; filename=wiki-export.json'})
+
+@app.cli.command("import-wiki")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--dry-run", is_flag=True, help="Validate and report without writing.")
+def import_wiki_command(path, dry_run):
+    """Imports wiki pages from a JSON or ZIP archive."""
+    with open(path, 'rb') as f:
+        pages = read_wiki_archive(f.read())
+    rows, errors = validate_wiki_pages(pages)
+    if errors:
+        for error in errors: click.echo(f"❌ {error}", err=True)
+        raise SystemExit(1)
+    summary = import_wiki_pages(rows, dry_run=dry_run)
+    domains = g.pop('changed_domains', None)
+    if domains: refresh_static_export(*domains, background=False)
+    click.echo(f"{'🔍 Dry run: ' if dry_run else '✅ '}{len(summary['new'])} new, {len(summary['updated'])} updated.")
+
+@app.cli.command("export-wiki")
+@click.option("--out", "out_file", type=click.File('w', encoding='utf-8'), default='-', help="Output file (defaults to stdout).")
+def export_wiki_command(out_file):
+    """Streams every wiki page to a JSON file."""
+    export = iter_wiki_export()
+    try:
+        for chunk in export: out_file.write(chunk)
+    finally:
+        export.close()
+
+# --- STATIC EXPORT ---
+# Pre-renders the anonymous public pages to STATIC_EXPORT_DIR so a front proxy can serve
+# them from disk (e.g. nginx `try_files $uri/index.html @flask`). Admin writes re-export
+# only the pages whose content domain changed, inline when that's a handful of pages;
+# bigger changes (bulk imports) get one full export in a background thread instead, so the
+# admin's request never runs into gunicorn's worker timeout.
+STATIC_EXPORT_DIR = os.getenv("STATIC_EXPORT_DIR")
+STATIC_EXPORT_PAGES = ['/', '/events', '/lore', '/rules', '/socials', '/wiki']
+STATIC_EXPORT_INLINE_PAGES = int(os.getenv("STATIC_EXPORT_INLINE_PAGES", "10"))
+
+static_export_lock = threading.Lock()
+static_export_pending = threading.Event()
+
+def get_public_paths():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT slug FROM wiki ORDER BY slug")
+    slugs = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return STATIC_EXPORT_PAGES + [f"/wiki/{quote(slug)}" for slug in slugs] + [f"/legal/{doc}" for doc in LEGAL_DATA]
+
+def static_paths_for_domain(domain):
+    """Maps a content_versions domain to the exported pages that render it."""
+    if domain.startswith("announcements:"):
+        return {"announcements:NEWS": ['/'], "announcements:EVENT": ['/events'], "announcements:LORE": ['/lore']}.get(domain, [])
+    if domain == "wiki": return ['/wiki']
+    if domain.startswith("wiki:"): return [f"/wiki/{quote(domain[5:])}"]
+    return []
+
+def static_export_file(out_dir, path):
+    root = os.path.abspath(out_dir)
+    target = os.path.abspath(os.path.join(root, path.strip('/'), 'index.html'))
+    if not target.startswith(root + os.sep): return None
+    return target
+
+def write_export_file(target, body):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp" # Inline and background exports may overlap
+    with open(tmp, 'wb') as f: f.write(body)
+    os.replace(tmp, target)
+
+def export_static_pages(out_dir, paths=None, sitemap=True):
+    """Renders public pages through the normal routes as an anonymous visitor. Returns the number written.
+
+    Without paths every public page is rendered. The sitemap only changes when wiki pages are
+    added or removed, so partial exports can skip it (and the query behind it).
+    """
+    public_paths = get_public_paths() if paths is None or sitemap else None
+    written = 0
+    # A fresh app context so the render requests get their own `g` instead of sharing the
+    # admin request's (changed domains, profiler) when this runs from an after_request hook.
+    with app.app_context():
+        client = app.test_client()
+        for path in (public_paths if paths is None else paths):
+            target = static_export_file(out_dir, path)
+            if not target: continue
+            resp = client.get(path)
+            if resp.status_code == 200:
+                write_export_file(target, resp.get_data())
+                written += 1
+            elif resp.status_code == 404:
+                # Deleted page: stop serving the stale copy.
+                if os.path.exists(target): os.remove(target)
+            else:
+                print(f"⚠️ Static Export: {path} returned {resp.status_code}, skipped.")
+
+    if not sitemap: return written
+    urls = ''.join(f"  <url><loc>{escape(SITE_URL + path)}</loc></url>\n" for path in public_paths)
+    sitemap = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n{urls}</urlset>\n'
+    write_export_file(os.path.join(os.path.abspath(out_dir), 'sitemap.xml'), sitemap.encode('utf-8'))
+    return written
+
+def refresh_static_export(*domains, background=True):
+    """Re-exports the pages behind the changed domains.
+
+    Up to STATIC_EXPORT_INLINE_PAGES pages are rendered right away; past that one full export
+    runs instead, in a background thread unless background=False (the CLI, which has no timeout).
+    """
+    if not STATIC_EXPORT_DIR: return
+    paths = sorted({path for domain in domains for path in static_paths_for_domain(domain)})
+    if not paths: return
+    if len(paths) > STATIC_EXPORT_INLINE_PAGES:
+        if background:
+            export_static_site_in_background()
+            return
+        paths = None
+    try:
+        export_static_pages(STATIC_EXPORT_DIR, paths, sitemap=paths is None or "wiki" in domains)
+    except Exception as e:
+        print(f"Static Export Error: {e}")
+
+def export_static_site_in_background():
+    """Starts a full export in a background thread. Requests made while one runs fold into a single rerun."""
+    static_export_pending.set()
+    if not static_export_lock.acquire(blocking=False): return
+    def run():
+        try:
+            while static_export_pending.is_set():
+                static_export_pending.clear()
+                try:
+                    export_static_pages(STATIC_EXPORT_DIR)
+                except Exception as e:
+                    print(f"Static Export Error: {e}")
+        finally:
+            static_export_lock.release()
+        # A request that arrived between the last check and the release would otherwise be lost
+        if static_export_pending.is_set(): export_static_site_in_background()
+    threading.Thread(target=run, name="static-export", daemon=True).start()
+
+@app.cli.command("export-static")
+@click.option("--out", "out_dir", default=None, help="Output directory (defaults to STATIC_EXPORT_DIR).")
+def export_static_command(out_dir):
+    """Pre-renders every public page and the sitemap to disk."""
+    out_dir = out_dir or STATIC_EXPORT_DIR
+    if not out_dir: raise click.UsageError("Set STATIC_EXPORT_DIR or pass --out.")
+    written = export_static_pages(out_dir)
+    click.echo(f"✅ Exported {written} pages to {out_dir}")
+
+@app.cli.command("measure-compression")
+@click.option("--runs", default=20, help="Compressions per route and encoding, averaged.")
+@click.argument("paths", nargs=-1)
+def measure_compression_command(runs, paths):
+    """Renders public pages and reports bytes saved and CPU cost per route and encoding."""
+    if not paths:
+        try: paths = get_public_paths()
+        except Exception: paths = STATIC_EXPORT_PAGES + [f"/legal/{doc}" for doc in LEGAL_DATA] # No MySQL: DB-backed pages will be skipped
+    encodings = ['gzip', 'br'] if brotli else ['gzip']
+    click.echo(f"{'route':<30} {'status':>6} {'raw':>8} " + ' '.join(f"{e + ' bytes':>10} {e + ' ms':>8}" for e in encodings))
+    with app.app_context():
+        client = app.test_client()
+        for path in paths:
+            resp = client.get(path)
+            body = resp.get_data()
+            if resp.status_code != 200 or resp.mimetype not in COMPRESSIBLE_MIMETYPES:
+                click.echo(f"{path:<30} {resp.status_code:>6} skipped")
+                continue
+            columns = []
+            for encoding in encodings:
+                started = time.process_time()
+                for _ in range(runs): size = len(compress_body(body, encoding))
+                columns.append(f"{size:>10} {(time.process_time() - started) * 1000 / runs:>8.3f}")
+            click.echo(f"{path:<30} {resp.status_code:>6} {len(body):>8} " + ' '.join(columns))
+
 # --- PUBLIC ROUTES (Fixed 404s) ---
 def build_wiki_tree(pages):
     tree = {}
@@ -601,31 +1686,29 @@ def build_wiki_tree(pages):
             current = current[part]["subcategories"]
     return tree
 
+def get_announcements(category):
+    def load():
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM announcements WHERE category=%s ORDER BY id DESC", (category,))
+        posts = cursor.fetchall()
+        conn.close()
+        return posts
+    return cached_content(f"announcements:{category}", load)
+
 @app.route('/')
 def home():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True) 
-    cursor.execute("SELECT * FROM announcements WHERE category='NEWS' ORDER BY id DESC")
-    posts = cursor.fetchall()
-    conn.close()
+    posts = get_announcements("NEWS")
     return render_template('home.html', user=session.get('user'), announcements=posts)
 
 @app.route('/events')
 def events():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM announcements WHERE category='EVENT' ORDER BY id DESC")
-    posts = cursor.fetchall()
-    conn.close()
+    posts = get_announcements("EVENT")
     return render_template('events.html', user=session.get('user'), announcements=posts)
 
 @app.route('/lore')
 def lore():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM announcements WHERE category='LORE' ORDER BY id DESC")
-    posts = cursor.fetchall()
-    conn.close()
+    posts = get_announcements("LORE")
     return render_template('lore.html', user=session.get('user'), announcements=posts)
 
 @app.route('/rules')
@@ -644,22 +1727,34 @@ def staff():
 
 @app.route('/wiki')
 def wiki_hub():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM wiki ORDER BY category, title")
-    rows = cursor.fetchall()
-    conn.close()
-    return render_template('wiki_hub.html', wiki_tree=build_wiki_tree(rows), user=session.get('user'))
+    def load():
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM wiki ORDER BY category, title")
+        rows = cursor.fetchall()
+        conn.close()
+        return build_wiki_tree(rows)
+    return render_template('wiki_hub.html', wiki_tree=cached_content("wiki", load), user=session.get('user'))
 
 @app.route('/wiki/<slug>')
 def wiki_page(slug):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM wiki WHERE slug=%s", (slug,))
-    page = cursor.fetchone()
-    conn.close()
-    if not page: return "Page not found", 404
-    return render_template('wiki_entry.html', page=page, user=session.get('user'))
+    def load():
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM wiki WHERE slug=%s", (slug,))
+        page = cursor.fetchone()
+        if not page:
+            conn.close()
+            return None
+        cursor.execute("SELECT w.slug, w.title FROM wiki_links l JOIN wiki w ON w.slug = l.source_slug WHERE l.target_slug=%s ORDER BY w.title", (slug,))
+        backlinks = cursor.fetchall()
+        cursor.execute("SELECT slug, title FROM wiki WHERE category=%s AND slug != %s ORDER BY title", (page['category'], slug))
+        neighbors = cursor.fetchall()
+        conn.close()
+        return {"page": page, "backlinks": backlinks, "neighbors": neighbors}
+    entry = cached_content(f"wiki:{slug}", load)
+    if not entry: return "Page not found", 404
+    return render_template('wiki_entry.html', page=entry["page"], backlinks=entry["backlinks"], neighbors=entry["neighbors"], user=session.get('user'))
 
 @app.route('/legal/<doc_type>')
 def legal_page(doc_type):
@@ -674,29 +1769,36 @@ def apply():
     hytale_data = get_hytale_profile(session['user']['id'])
     return render_template('apply.html', user=session['user'], player=hytale_data)
 
-@app.route('/submit', methods=['POST'])
-def submit_application():
-    if 'user' not in session: 
-        return jsonify({'error': 'Unauthorized'}), 401
-    
-    # 1. Get Data Safely
-    data = request.get_json(silent=True) or {}
-    user = session['user']
-    webhook_url = os.getenv("DISCORD_WEBHOOK_URL") 
-    
-    if not webhook_url:
-        print("Error: No Application Webhook URL found.")
-        return jsonify({'success': False, 'error': 'Server configuration error.'}), 500
-
-    # HELPER: Clean data to ensure no crashes
-    def clean(val):
-        if val is None: return "N/A"
-        s = str(val).strip()
-        if s == "": return "N/A"
-        return s
-
-    # 2. Prep Basic Info
-    team_name = clean(data.get('team', 'General'))
+# --- APPLICATIONS ---
+# When Discord can't take an application, it is stored in `application_queue` and
+# delivered later by a background flush (after the next successful submission) or by
+# `flask deliver-applications`. If Discord fails after the thread was created, only the
+# unsent answer messages are queued, together with the thread id. Applications Discord
+# rejects outright are kept with `failed_at`/`last_error` instead of being deleted.
+APPLICATION_QUEUE_BATCH = 20
+
+class PartialDelivery(Exception):
+    """Discord stopped answering after the application thread was created."""
+    def __init__(self, thread_id, payloads):
+        super().__init__(f"{len(payloads)} answer messages not delivered to thread {thread_id}")
+        self.thread_id = thread_id
+        self.payloads = payloads
+
+def clean_answer(val):
+    """Clean data to ensure no crashes"""
+    if val is None: return "N/A"
+    s = str(val).strip()
+    if s == "": return "N/A"
+    return s
+
+def deliver_application(webhook_url, user, data):
+    """Posts an application to the forum webhook. Returns None on success or (error, status).
+
+    Raises DependencyUnavailable when Discord can't be reached, so the caller can queue it,
+    or PartialDelivery when it stops answering after the thread was created.
+    """
+    # 1. Prep Basic Info
+    team_name = clean_answer(data.get('team', 'General'))
     discord_username = user.get('username', 'Unknown')
     discord_id = user.get('id', 'Unknown')
     
@@ -704,8 +1806,8 @@ def submit_application():
     if user.get("avatar"):
         avatar_url = f"https://cdn.discordapp.com/avatars/{user['id']}/{user['avatar']}.png"
 
-    # --- STEP 3: CREATE THE THREAD ---
-    # We send JUST the header info first. This guarantees the thread is created.
+    # --- STEP 2: CREATE THE THREAD ---
+    # The header goes first, followed by as many answers as still fit in the same message.
     
     header_embed = {
         "title": f"📝 New Application: {team_name}",
@@ -713,89 +1815,176 @@ def submit_application():
         "thumbnail": {"url": avatar_url} if avatar_url else {},
         "fields": [
             {"name": "Discord User", "value": f"<@{discord_id}> ({discord_username})", "inline": False},
-            {"name": "Hytale Name", "value": clean(data.get('hytale_name')), "inline": True},
-            {"name": "Age", "value": clean(data.get('age')), "inline": True},
-            {"name": "Timezone", "value": clean(data.get('timezone')), "inline": True},
-            {"name": "Availability", "value": clean(data.get('availability')), "inline": True},
-            {"name": "Languages", "value": clean(data.get('languages')), "inline": False},
+            {"name": "Hytale Name", "value": clean_answer(data.get('hytale_name')), "inline": True},
+            {"name": "Age", "value": clean_answer(data.get('age')), "inline": True},
+            {"name": "Timezone", "value": clean_answer(data.get('timezone')), "inline": True},
+            {"name": "Availability", "value": clean_answer(data.get('availability')), "inline": True},
+            {"name": "Languages", "value": clean_answer(data.get('languages')), "inline": False},
         ],
         "footer": {"text": "Majikku Network Application System"}
     }
 
+    answers = data.get('answers', {})
+    fields = [(question, clean_answer(answer)) for question, answer in answers.items() if question and str(question).strip() != ""]
+    messages = pack_embed_messages(fields, color=10182117, first_embeds=[header_embed])
+
     # IMPORTANT: ?wait=true tells Discord to return the message data (so we get the Thread ID)
     thread_start_url = f"{webhook_url}?wait=true"
     
     start_payload = {
         "thread_name": f"APP: {discord_username} - {team_name}", # Required for Forum Channels
-        "embeds": [header_embed]
+        **messages[0]
     }
 
-    thread_id = None
-
     try:
         # Send the Header
-        resp = requests.post(thread_start_url, json=start_payload)
-        
-        if not resp.ok:
-            print(f"⚠️ Thread Creation Error: {resp.text}")
-            return jsonify({'success': False, 'error': f"Discord Error: {resp.text}"}), resp.status_code
-            
-        # Get the Thread ID from the response (channel_id of the message IS the thread id)
-        thread_id = resp.json().get('channel_id')
-        
+        resp = breaker_request(discord_breaker, 'POST', thread_start_url, json=start_payload)
     except requests.exceptions.RequestException as e:
         print(f"❌ Connection Error: {e}")
-        return jsonify({'success': False, 'error': 'Failed to connect to Discord.'}), 500
+        raise DependencyUnavailable(discord_breaker.name)
+
+    if resp.status_code >= 500 or resp.status_code == 429:
+        print(f"⚠️ Thread Creation Error: {resp.status_code}")
+        raise DependencyUnavailable(discord_breaker.name)
+    if not resp.ok:
+        print(f"⚠️ Thread Creation Error: {resp.text}")
+        return f"Discord Error: {resp.text}", resp.status_code
+        
+    # Get the Thread ID from the response (channel_id of the message IS the thread id)
+    thread_id = resp.json().get('channel_id')
 
-    # --- STEP 4: SEND ANSWERS (Batched) ---
-    # Now we post the answers into the thread we just created using ?thread_id=
+    # --- STEP 3: SEND THE REMAINING ANSWERS (Batched) ---
+    # Answers that didn't fit in the first message go into the thread we just created using ?thread_id=
     
     if thread_id:
-        followup_url = f"{webhook_url}?thread_id={thread_id}"
-        
-        answers = data.get('answers', {})
-        current_fields = []
-        current_char_count = 0
-        
-        # Function to send a batch of fields
-        def send_batch(fields):
-            if not fields: return
-            payload = {"embeds": [{"color": 10182117, "fields": fields}]}
+        send_application_answers(webhook_url, thread_id, messages[1:])
+
+    return None
+
+def send_application_answers(webhook_url, thread_id, payloads):
+    """Posts answer messages into the thread. Raises PartialDelivery with whatever is left if Discord fails."""
+    followup_url = f"{webhook_url}?thread_id={thread_id}"
+    for i, payload in enumerate(payloads):
+        if i: time.sleep(0.5) # Be nice to Discord API rate limits
+        try:
+            resp = breaker_request(discord_breaker, 'POST', followup_url, json=payload)
+            if resp.status_code == 429:
+                time.sleep(float(resp.json().get('retry_after', 1)))
+                resp = breaker_request(discord_breaker, 'POST', followup_url, json=payload)
+        except (DependencyUnavailable, requests.exceptions.RequestException) as e:
+            print(f"Error sending batch: {e}")
+            raise PartialDelivery(thread_id, payloads[i:])
+        if resp.status_code >= 500 or resp.status_code == 429:
+            print(f"Error sending batch: {resp.status_code}")
+            raise PartialDelivery(thread_id, payloads[i:])
+        if not resp.ok:
+            # A malformed message won't succeed on retry either; the rest still go out.
+            print(f"Error sending batch: {resp.text}")
+
+def queue_application(user, data, thread_id=None, payloads=None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO application_queue (user_json, data_json, thread_id, payloads_json) VALUES (%s, %s, %s, %s)",
+                   (json.dumps(user), json.dumps(data), thread_id, json.dumps(payloads) if payloads is not None else None))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def deliver_queued_applications():
+    """Delivers queued applications oldest first, stopping as soon as Discord fails again. Returns the number sent."""
+    webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
+    if not webhook_url: return 0
+    sent = 0
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM application_queue WHERE failed_at IS NULL AND (claimed_at IS NULL OR claimed_at < NOW() - INTERVAL 10 MINUTE) ORDER BY id LIMIT %s", (APPLICATION_QUEUE_BATCH,))
+        for row in cursor.fetchall():
+            # Claim the row so another worker flushing at the same time skips it.
+            cursor.execute("UPDATE application_queue SET claimed_at = NOW() WHERE id = %s AND (claimed_at IS NULL OR claimed_at < NOW() - INTERVAL 10 MINUTE)", (row['id'],))
+            conn.commit()
+            if cursor.rowcount != 1: continue
             try:
-                requests.post(followup_url, json=payload)
-                time.sleep(0.5) # Be nice to Discord API rate limits
-            except Exception as e:
-                print(f"Error sending batch: {e}")
-
-        # Loop through every answer
-        for question, answer in answers.items():
-            if not question or str(question).strip() == "": continue
-            
-            # 1. Truncate if user wrote an entire novel (Discord Limit is 1024)
-            val_str = clean(answer)
-            if len(val_str) > 1024:
-                val_str = val_str[:1021] + "..."
-            
-            # 2. Check Batch Limits (Max 25 fields OR Max 6000 chars per embed)
-            # We use a safe buffer of 5000 chars to be sure.
-            if len(current_fields) >= 25 or (current_char_count + len(val_str) > 5000):
-                send_batch(current_fields)
-                current_fields = []
-                current_char_count = 0
-            
-            current_fields.append({
-                "name": str(question)[:256], 
-                "value": val_str, 
-                "inline": False
-            })
-            current_char_count += len(val_str)
+                if row['thread_id']:
+                    send_application_answers(webhook_url, row['thread_id'], json.loads(row['payloads_json']))
+                    error = None
+                else:
+                    error = deliver_application(webhook_url, json.loads(row['user_json']), json.loads(row['data_json']))
+            except DependencyUnavailable:
+                cursor.execute("UPDATE application_queue SET claimed_at = NULL WHERE id = %s", (row['id'],))
+                conn.commit()
+                break
+            except PartialDelivery as e:
+                cursor.execute("UPDATE application_queue SET claimed_at = NULL, thread_id = %s, payloads_json = %s WHERE id = %s",
+                               (e.thread_id, json.dumps(e.payloads), row['id']))
+                conn.commit()
+                break
+            if error:
+                # Keep it: a misconfigured webhook must not throw applications away.
+                print(f"⚠️ Queued application {row['id']} was rejected: {error[0]}")
+                cursor.execute("UPDATE application_queue SET claimed_at = NULL, failed_at = NOW(), last_error = %s WHERE id = %s", (error[0], row['id']))
+                conn.commit()
+                continue
+            cursor.execute("DELETE FROM application_queue WHERE id = %s", (row['id'],))
+            conn.commit()
+            sent += 1
+    finally:
+        cursor.close()
+        conn.close()
+    return sent
+
+def flush_application_queue():
+    try: deliver_queued_applications()
+    except Exception as e: print(f"Application Queue Error: {e}")
+
+@app.route('/submit', methods=['POST'])
+def submit_application():
+    if 'user' not in session: 
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    # 1. Get Data Safely
+    data = request.get_json(silent=True) or {}
+    user = session['user']
+    webhook_url = os.getenv("DISCORD_WEBHOOK_URL") 
+    
+    if not webhook_url:
+        print("Error: No Application Webhook URL found.")
+        return jsonify({'success': False, 'error': 'Server configuration error.'}), 500
+
+    try:
+        error = deliver_application(webhook_url, user, data)
+    except (DependencyUnavailable, PartialDelivery) as e:
+        try:
+            if isinstance(e, PartialDelivery): queue_application(user, data, e.thread_id, e.payloads)
+            else: queue_application(user, data)
+        except Exception as e:
+            print(f"❌ Could not queue application: {e}")
+            return jsonify({'success': False, 'error': 'Discord is not responding right now. Please try again in a few minutes.'}), 503
+        return jsonify({'success': True, 'queued': True, 'message': 'Discord is having trouble right now, so submissions are temporarily queued. Your application is saved and will be delivered automatically.'})
 
-        # 3. Send whatever is left
-        if current_fields:
-            send_batch(current_fields)
+    if error:
+        return jsonify({'success': False, 'error': error[0]}), error[1]
 
+    # Discord is answering again, so send anything that was queued while it was down.
+    threading.Thread(target=flush_application_queue, daemon=True).start()
     return jsonify({'success': True, 'message': 'Application submitted successfully!'})
 
+@app.cli.command("deliver-applications")
+@click.option("--retry-failed", is_flag=True, help="Also retry applications Discord rejected earlier (e.g. after fixing the webhook).")
+def deliver_applications_command(retry_failed):
+    """Sends applications that were queued while Discord was unavailable."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if retry_failed:
+        cursor.execute("UPDATE application_queue SET failed_at = NULL, last_error = NULL WHERE failed_at IS NOT NULL")
+        conn.commit()
+    click.echo(f"✅ Delivered {deliver_queued_applications()} queued applications.")
+    cursor.execute("SELECT id, last_error FROM application_queue WHERE failed_at IS NOT NULL ORDER BY id")
+    for app_id, last_error in cursor.fetchall():
+        click.echo(f"⚠️ Application {app_id} was rejected by Discord: {last_error}")
+    cursor.close()
+    conn.close()
+
 @app.route('/appeal')
 def appeal():
     if 'user' not in session: return redirect(url_for('login'))
@@ -844,6 +2033,51 @@ def report_success(report_id):
     if 'user' not in session: return redirect(url_for('login'))
     return render_template('report_success.html', user=session['user'], report_id=report_id)
 
+# --- HEALTH ---
+@app.errorhandler(DependencyUnavailable)
+def dependency_unavailable(e):
+    return f"{e.name.title()} is not responding right now. Please try again in a minute.", 503, {"Retry-After": "30"}
+
+def mysql_query_failed(e):
+    # A query that got through get_db_connection() but then failed or timed out
+    record_mysql_error(e)
+    return dependency_unavailable(DependencyUnavailable(mysql_breaker.name))
+
+for error in MYSQL_OUTAGE_ERRORS: app.register_error_handler(error, mysql_query_failed)
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the worker is answering. Reports breaker state without calling anything."""
+    return jsonify({"status": "ok", "dependencies": {b.name: b.status() for b in BREAKERS}})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: MySQL answers a trivial query. Discord being down only degrades the site."""
+    dependencies = {b.name: b.status() for b in BREAKERS}
+    started = time.monotonic()
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        except mysql.connector.Error:
+            mysql_breaker.record(False, (time.monotonic() - started) * 1000)
+            raise
+        finally:
+            conn.close()
+        probe_ms = (time.monotonic() - started) * 1000
+        mysql_breaker.record(True, probe_ms)
+        dependencies["mysql"]["probe_ms"] = round(probe_ms, 1)
+        ready = True
+    except Exception as e:
+        dependencies["mysql"]["error"] = str(e)
+        ready = False
+    degraded = any(b.state != "closed" for b in BREAKERS)
+    status = "unavailable" if not ready else ("degraded" if degraded else "ok")
+    return jsonify({"status": status, "dependencies": dependencies}), 200 if ready else 503
+
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),'favicon.ico', mimetype='image/vnd.microsoft.icon')
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import app as site
+
+STAFF_ID = "123456789"
+STAFF_HASH = "0123456789abcdef0123456789abcdef"
+ADMIN_ROLE = site.STAFF_GROUPS[0]["roles"][0]["id"]
+
+
+def png_bytes(size=256, color=(200, 40, 40)):
+    out = io.BytesIO()
+    Image.new("RGB", (size, size), color).save(out, "PNG")
+    return out.getvalue()
+
+
+class StubDiscord(BaseHTTPRequestHandler):
+    """Answers the guild member list and serves CDN avatars, counting CDN downloads."""
+    members = []
+    cdn_hits = []
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.endswith("/members"):
+            body, mimetype = json.dumps(self.members).encode(), "application/json"
+        elif path.startswith("/avatars/") and path.endswith(".png"):
+            self.cdn_hits.append(path)
+            body, mimetype = png_bytes(), "image/png"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", mimetype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def member(user_id, avatar_hash):
+    return {"user": {"id": user_id, "username": f"user{user_id}", "avatar": avatar_hash}, "roles": [ADMIN_ROLE]}
+
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    StubDiscord.members = [member(STAFF_ID, STAFF_HASH)]
+    StubDiscord.cdn_hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubDiscord)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    monkeypatch.setattr(site, "API_ENDPOINT", base)
+    monkeypatch.setattr(site, "AVATAR_CDN_URL", base)
+    monkeypatch.setattr(site, "AVATAR_CACHE_DIR", str(tmp_path))
+    # No MySQL here: skip the cross-worker version poll and start from an empty roster cache
+    monkeypatch.setitem(site.content_versions, "checked_at", float("inf"))
+    site.content_cache.pop("staff", None)
+    for breaker in (site.discord_breaker, site.cdn_breaker):
+        monkeypatch.setattr(breaker, "state", "closed")
+        breaker.results.clear()
+
+    yield StubDiscord, tmp_path
+    server.shutdown()
+    server.server_close()
+    site.content_cache.pop("staff", None)
+
+
+def test_first_fetch_is_resized_webp_and_then_served_from_disk(stub):
+    discord, cache_dir = stub
+    client = site.app.test_client()
+
+    r = client.get(f"/avatars/{STAFF_ID}/{STAFF_HASH}.webp")
+    assert r.status_code == 200
+    assert r.mimetype == "image/webp"
+    assert "immutable" in r.headers["Cache-Control"]
+    assert "max-age=31536000" in r.headers["Cache-Control"]
+    img = Image.open(io.BytesIO(r.data))
+    assert img.format == "WEBP"
+    assert img.size == (site.AVATAR_SIZE, site.AVATAR_SIZE)
+    assert os.listdir(cache_dir) == [f"{STAFF_ID}_{STAFF_HASH}.webp"]
+    assert len(discord.cdn_hits) == 1
+
+    r = client.get(f"/avatars/{STAFF_ID}/{STAFF_HASH}.webp")
+    assert r.status_code == 200
+    assert len(discord.cdn_hits) == 1
+
+
+def test_avatars_off_the_roster_are_not_fetched(stub):
+    discord, cache_dir = stub
+    client = site.app.test_client()
+
+    r = client.get(f"/avatars/42/{STAFF_HASH}.webp")
+    assert r.status_code == 404
+    r = client.get(f"/avatars/{STAFF_ID}/../secret.webp")
+    assert r.status_code == 404
+    assert discord.cdn_hits == []
+    assert os.listdir(cache_dir) == []
+
+
+def test_least_recently_used_avatars_are_evicted(stub, monkeypatch):
+    discord, cache_dir = stub
+    ids = [str(1000 + i) for i in range(3)]
+    discord.members = [member(user_id, STAFF_HASH) for user_id in ids]
+    client = site.app.test_client()
+
+    assert client.get(f"/avatars/{ids[0]}/{STAFF_HASH}.webp").status_code == 200
+    one_avatar = os.path.getsize(cache_dir / f"{ids[0]}_{STAFF_HASH}.webp")
+    # Room for two avatars; the third download pushes the cache over the limit
+    monkeypatch.setattr(site, "AVATAR_CACHE_MAX_BYTES", 2 * one_avatar)
+    os.utime(cache_dir / f"{ids[0]}_{STAFF_HASH}.webp", (1, 1))
+    assert client.get(f"/avatars/{ids[1]}/{STAFF_HASH}.webp").status_code == 200
+    os.utime(cache_dir / f"{ids[1]}_{STAFF_HASH}.webp", (2, 2))
+    # A cache hit refreshes the first avatar, so the second is now the oldest
+    assert client.get(f"/avatars/{ids[0]}/{STAFF_HASH}.webp").status_code == 200
+    assert client.get(f"/avatars/{ids[2]}/{STAFF_HASH}.webp").status_code == 200
+
+    assert sorted(os.listdir(cache_dir)) == sorted(f"{i}_{STAFF_HASH}.webp" for i in (ids[0], ids[2]))
+    assert len(discord.cdn_hits) == 3
@@ -0,0 +1,151 @@
+import random
+
+from app import (
+    EMBED_FIELD_NAME_LIMIT, EMBED_FIELD_VALUE_LIMIT, EMBED_FIELDS_LIMIT,
+    MESSAGE_CHARS_LIMIT, MESSAGE_EMBEDS_LIMIT, pack_embed_messages,
+)
+
+
+def assert_within_limits(messages):
+    for message in messages:
+        assert 1 <= len(message["embeds"]) <= MESSAGE_EMBEDS_LIMIT
+        chars = 0
+        for embed in message["embeds"]:
+            assert 1 <= len(embed["fields"]) <= EMBED_FIELDS_LIMIT
+            chars += len(embed.get("title", "")) + len(embed.get("footer", {}).get("text", ""))
+            for field in embed["fields"]:
+                assert 0 < len(field["name"]) <= EMBED_FIELD_NAME_LIMIT
+                assert 0 < len(field["value"]) <= EMBED_FIELD_VALUE_LIMIT
+                chars += len(field["name"]) + len(field["value"])
+        assert chars <= MESSAGE_CHARS_LIMIT
+
+
+def packed_fields(messages):
+    return [field for message in messages for embed in message["embeds"] for field in embed["fields"]]
+
+
+def test_many_tiny_fields_fill_embeds_and_messages():
+    fields = [(f"Q{i}", "y") for i in range(300)]
+    messages = pack_embed_messages(fields, color=1)
+    assert_within_limits(messages)
+    # 250 fields fit in one message (10 embeds x 25 fields), the remaining 50 in a second
+    assert len(messages) == 2
+    assert [len(e["fields"]) for e in messages[0]["embeds"]] == [25] * 10
+    assert [len(e["fields"]) for e in messages[1]["embeds"]] == [25, 25]
+
+
+def test_maximum_size_answers_hit_the_character_limit():
+    fields = [(f"{i:03d}" + "Q" * 253, "A" * 1024) for i in range(40)]
+    messages = pack_embed_messages(fields, color=1)
+    assert_within_limits(messages)
+    # 1280 characters per field: 4 fit under 6000, so 40 answers need 10 messages
+    assert len(messages) == 10
+    assert all(len(packed_fields([m])) == 4 for m in messages)
+
+
+def test_oversized_names_and_values_are_truncated():
+    messages = pack_embed_messages([("Q" * 5000, "A" * 50000)], color=1)
+    assert_within_limits(messages)
+    field = packed_fields(messages)[0]
+    assert len(field["name"]) == EMBED_FIELD_NAME_LIMIT and field["name"].endswith("...")
+    assert len(field["value"]) == EMBED_FIELD_VALUE_LIMIT and field["value"].endswith("...")
+
+
+def test_question_order_is_kept_across_messages():
+    fields = [(f"Question {i}", "A" * (1 + (i * 397) % 1024)) for i in range(120)]
+    messages = pack_embed_messages(fields, color=1)
+    assert_within_limits(messages)
+    assert [f["name"] for f in packed_fields(messages)] == [name for name, _ in fields]
+
+
+def sized(*sizes):
+    # Fields that count exactly `size` characters (2 to 1280), none of them truncated
+    return [("Q" * max(1, size - EMBED_FIELD_VALUE_LIMIT), "A" * (size - max(1, size - EMBED_FIELD_VALUE_LIMIT))) for size in sizes]
+
+
+def test_character_limit_boundary():
+    assert len(pack_embed_messages(sized(*[1000] * 6), color=1)) == 1  # exactly 6000
+    assert len(pack_embed_messages(sized(*[1000] * 5, 999), color=1)) == 1  # 5999
+    assert len(pack_embed_messages(sized(*[1000] * 5, 999, 2), color=1)) == 2  # 6001
+    assert len(pack_embed_messages(sized(*[1000] * 6, 2), color=1)) == 2
+
+
+def test_field_count_boundary():
+    assert len(pack_embed_messages([("q", "a")] * 250, color=1)) == 1
+    messages = pack_embed_messages([("q", "a")] * 251, color=1)
+    assert len(messages) == 2
+    assert packed_fields(messages[1:]) == [{"name": "q", "value": "a", "inline": False}]
+
+
+def optimal_message_count(sizes, first_chars=MESSAGE_CHARS_LIMIT, first_count=MESSAGE_EMBEDS_LIMIT * EMBED_FIELDS_LIMIT):
+    """Brute-force optimum over every way of splitting the ordered fields into messages."""
+    best = {0: 0}
+    for end in range(1, len(sizes) + 1):
+        for start in range(end):
+            if start not in best: continue
+            chars_limit, count_limit = (first_chars, first_count) if start == 0 else (MESSAGE_CHARS_LIMIT, MESSAGE_EMBEDS_LIMIT * EMBED_FIELDS_LIMIT)
+            if sum(sizes[start:end]) <= chars_limit and end - start <= count_limit:
+                best[end] = min(best.get(end, len(sizes) + 1), best[start] + 1)
+    return best[len(sizes)]
+
+
+def test_message_count_matches_brute_force_optimum():
+    rng = random.Random(20261019)
+    for _ in range(200):
+        sizes = [rng.choice([2, 3, 500, 999, 1000, 1001, 1280, rng.randint(2, 1280)]) for _ in range(rng.randint(1, 30))]
+        messages = pack_embed_messages(sized(*sizes), color=1)
+        assert_within_limits(messages)
+        assert len(messages) == optimal_message_count(sizes), sizes
+
+
+HEADER = {
+    "title": "New Application: Builders",
+    "color": 1,
+    "fields": [{"name": "Discord User", "value": "<@1> (someone)", "inline": False}],
+    "footer": {"text": "Majikku Network Application System"},
+}
+HEADER_CHARS = len(HEADER["title"]) + len("Discord User") + len("<@1> (someone)") + len(HEADER["footer"]["text"])
+
+
+def test_answers_share_the_first_message_with_the_header():
+    messages = pack_embed_messages([("q1", "a"), ("q2", "b")], color=1, first_embeds=[HEADER])
+    assert_within_limits(messages)
+    assert len(messages) == 1
+    assert messages[0]["embeds"][0] is HEADER and len(HEADER["fields"]) == 1
+    assert [f["name"] for f in messages[0]["embeds"][1]["fields"]] == ["q1", "q2"]
+
+
+def test_header_only_application_is_one_message():
+    assert pack_embed_messages([], color=1, first_embeds=[HEADER]) == [{"embeds": [HEADER]}]
+
+
+def test_header_counts_against_the_first_message():
+    room = MESSAGE_CHARS_LIMIT - HEADER_CHARS
+    assert len(pack_embed_messages(sized(*[1000] * 5, room - 5000), color=1, first_embeds=[HEADER])) == 1
+    messages = pack_embed_messages(sized(*[1000] * 5, room - 4999), color=1, first_embeds=[HEADER])
+    assert len(messages) == 2
+    assert len(packed_fields(messages[1:])) == 1
+    # The header takes one of the ten embeds, leaving room for 9 x 25 answers
+    assert len(pack_embed_messages([("q", "a")] * 225, color=1, first_embeds=[HEADER])) == 1
+    assert len(pack_embed_messages([("q", "a")] * 226, color=1, first_embeds=[HEADER])) == 2
+
+
+def test_header_packing_matches_brute_force_optimum():
+    rng = random.Random(1019)
+    for _ in range(200):
+        sizes = [rng.choice([2, 999, 1000, 1280, rng.randint(2, 1280)]) for _ in range(rng.randint(0, 30))]
+        messages = pack_embed_messages(sized(*sizes), color=1, first_embeds=[HEADER])
+        assert_within_limits(messages)
+        expected = optimal_message_count(sizes, MESSAGE_CHARS_LIMIT - HEADER_CHARS, (MESSAGE_EMBEDS_LIMIT - 1) * EMBED_FIELDS_LIMIT)
+        # The header is sent even when there are no answers
+        assert len(messages) == max(1, expected), sizes
+
+
+def test_empty_names_and_values_are_replaced():
+    messages = pack_embed_messages([("q", ""), ("   ", "a"), ("q", None)], color=1)
+    assert_within_limits(messages)
+    assert [(f["name"], f["value"]) for f in packed_fields(messages)] == [("q", "N/A"), ("N/A", "a"), ("q", "N/A")]
+
+
+def test_no_fields_means_no_messages():
+    assert pack_embed_messages([], color=1) == []
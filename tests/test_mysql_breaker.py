@@ -0,0 +1,50 @@
+import mysql.connector
+import pytest
+
+import app as site
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = site.CircuitBreaker("mysql")
+    monkeypatch.setattr(site, "mysql_breaker", breaker)
+    monkeypatch.setitem(site.content_versions, "checked_at", float("inf"))
+    yield breaker
+    site.content_cache.pop("test", None)
+
+
+def lost_connection():
+    raise mysql.connector.errors.OperationalError(msg="Lost connection to MySQL server during query", errno=2013)
+
+
+def test_query_timeouts_count_against_the_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(mysql.connector.Error):
+            site.cached_content("test", lost_connection)
+    assert breaker.state == "open"
+
+
+def test_bad_queries_do_not_count(breaker):
+    def bad_query():
+        raise mysql.connector.errors.ProgrammingError(msg="Unknown column", errno=1054)
+
+    for _ in range(breaker.min_calls):
+        with pytest.raises(mysql.connector.errors.ProgrammingError):
+            site.cached_content("test", bad_query)
+    assert breaker.state == "closed"
+    assert list(breaker.results) == []
+
+
+def test_stale_entry_is_served_when_a_query_fails(breaker):
+    site.content_cache["test"] = {"data": "stale", "timestamp": 0}
+    assert site.cached_content("test", lost_connection, max_age=1) == "stale"
+    assert list(breaker.results) == [False]
+
+
+def test_uncaught_query_failures_answer_503(breaker):
+    err = mysql.connector.errors.ReadTimeoutError(msg="Read timeout")
+    with site.app.test_request_context("/wiki"):
+        r = site.app.make_response(site.app.handle_user_exception(err))
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "30"
+    assert list(breaker.results) == [False]
@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+import app as site
+
+
+class Calls(list):
+    done = None
+
+
+@pytest.fixture
+def exports(monkeypatch, tmp_path):
+    calls = Calls()
+    done = threading.Event()
+
+    def export_static_pages(out_dir, paths=None, sitemap=True):
+        calls.append((paths, sitemap, threading.current_thread().name))
+        done.set()
+        return 0
+
+    monkeypatch.setattr(site, "STATIC_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(site, "STATIC_EXPORT_INLINE_PAGES", 3)
+    monkeypatch.setattr(site, "export_static_pages", export_static_pages)
+    calls.done = done
+    return calls
+
+
+def test_a_single_edit_is_exported_inline(exports):
+    site.refresh_static_export("wiki", "wiki:dragons")
+    assert exports == [(["/wiki", "/wiki/dragons"], True, threading.current_thread().name)]
+
+
+def test_announcements_skip_the_sitemap(exports):
+    site.refresh_static_export("announcements:NEWS")
+    assert exports == [(["/"], False, threading.current_thread().name)]
+
+
+def test_bulk_changes_run_one_full_export_in_the_background(exports):
+    site.refresh_static_export("wiki", *[f"wiki:page-{i}" for i in range(200)])
+    assert exports.done.wait(5)
+    with site.static_export_lock: pass  # Wait for the background thread to finish
+    assert exports == [(None, True, "static-export")]
+
+
+def test_bulk_changes_from_the_cli_export_inline(exports):
+    site.refresh_static_export("wiki", *[f"wiki:page-{i}" for i in range(200)], background=False)
+    assert exports == [(None, True, threading.current_thread().name)]
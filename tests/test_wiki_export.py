@@ -0,0 +1,90 @@
+import json
+
+import mysql.connector
+import pytest
+
+import app as site
+
+
+class FakeCursor:
+    """Unbuffered cursor: close() refuses while rows are unread, like mysql-connector does."""
+
+    def __init__(self, rows, fail_query=False):
+        self.rows = list(rows)
+        self.fail_query = fail_query
+
+    def execute(self, query, params=None):
+        if self.fail_query:
+            raise mysql.connector.errors.OperationalError(msg="Lost connection to MySQL server during query", errno=2013)
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        if self.rows: raise mysql.connector.errors.InternalError("Unread result found")
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def close(self):
+        self.closed = True
+
+
+def pages(n):
+    return [{"slug": f"page-{i:04d}", "title": f"Page {i}", "category": "Lore", "content": "<p>x</p>"} for i in range(n)]
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    opened = []
+
+    def use(cursor):
+        def get_db_connection():
+            conn = FakeConnection(cursor)
+            opened.append(conn)
+            return conn
+        monkeypatch.setattr(site, "get_db_connection", get_db_connection)
+        return opened
+    return use
+
+
+def test_export_is_a_json_list_and_closes_the_connection(connect):
+    opened = connect(FakeCursor(pages(250)))
+    assert json.loads("".join(site.iter_wiki_export())) == pages(250)
+    assert opened[0].closed
+
+
+def test_aborted_download_still_closes_the_connection(connect):
+    opened = connect(FakeCursor(pages(250)))
+    export = site.iter_wiki_export()
+    next(export)
+    export.close()
+    assert opened[0].closed
+
+
+def test_query_failure_raises_before_streaming(connect):
+    opened = connect(FakeCursor([], fail_query=True))
+    with pytest.raises(mysql.connector.errors.OperationalError):
+        site.iter_wiki_export()
+    assert opened[0].closed
+
+
+def test_database_outage_is_a_503_not_a_truncated_download(monkeypatch):
+    def unavailable():
+        raise site.DependencyUnavailable("mysql")
+    monkeypatch.setattr(site, "get_db_connection", unavailable)
+    client = site.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"id": "1", "username": "admin"}
+        sess["is_admin"] = True
+
+    r = client.get("/admin/wiki/export")
+    assert r.status_code == 503
+    assert "Content-Disposition" not in r.headers